@@ -1,9 +1,31 @@
 import streamlit as st
-from pymongo import MongoClient
+import bson
+from pymongo import MongoClient, UpdateOne
+import numpy as np
 import pandas as pd
-import pandasql as psql
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from numba import njit, prange
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import io
 import json
+import orjson
+import math
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from functools import partial, reduce
+from itertools import islice
+
+# Number of documents requested from the server per batch when loading
+LOAD_BATCH_SIZE = 10_000
+# Number of documents sent per insert_many call when saving
+SAVE_BATCH_SIZE = 5000
+# Number of insert_many calls allowed in flight at once when saving
+SAVE_WORKERS = 4
+# Number of rows sent to the data editor at a time
+EDITOR_PAGE_SIZE = 500
 
 # Connect to MongoDB
 @st.cache_resource
@@ -13,53 +35,257 @@ def get_mongo_client():
     return client
 
 # Fetch database and collection names
-def get_database_names(client):
-    return client.list_database_names()
+@st.cache_data(ttl=60, show_spinner=False)
+def get_database_names(_client):
+    return _client.list_database_names()
 
-def get_collection_names(client, db_name):
-    db = client[db_name]
+@st.cache_data(ttl=60, show_spinner=False)
+def get_collection_names(_client, db_name):
+    db = _client[db_name]
     return db.list_collection_names()
 
-# Load data from the selected collection
-def load_data(client, db_name, collection_name):
+# Fetch the field names of a sample document, offered as the fields to load
+@st.cache_data(ttl=60, show_spinner=False)
+def get_field_names(_client, db_name, collection_name):
+    sample = _client[db_name][collection_name].find_one({}, projection={'_id': False})
+    return list(sample or {})
+
+# Forget cached names after a save may have created a database, collection or field
+def clear_name_caches():
+    get_database_names.clear()
+    get_collection_names.clear()
+    get_field_names.clear()
+
+# Split an iterable into lists of at most `size` items
+def iter_batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+# Turn a batch of documents into one list of values per field (missing fields become None)
+def batch_to_columns(docs):
+    columns = {}
+    for i, doc in enumerate(docs):
+        for key, value in doc.items():
+            if key not in columns:
+                columns[key] = [None] * len(docs)
+            columns[key][i] = value
+    return columns
+
+# Load data from the selected collection, fetching only `fields` when given
+def load_data(client, db_name, collection_name, fields=None):
     db = client[db_name]
     collection = db[collection_name]
-    data = pd.DataFrame(list(collection.find()))
-    if '_id' in data.columns:
-        data = data.drop(columns=['_id'])
+    projection = {'_id': False}
+    if fields:
+        projection.update(dict.fromkeys(fields, True))
+    # Each raw batch is one BSON buffer from the server, decoded in a single C call with the
+    # collection's codec options (tz_aware, uuidRepresentation, type registry) as find() would
+    raw_batches = collection.find_raw_batches({}, projection=projection, batch_size=LOAD_BATCH_SIZE)
+
+    # Scalar columns are accumulated as typed Arrow chunks; embedded documents, arrays and
+    # fields Arrow can't hold (ObjectId, Decimal128, mixed types, ...) are kept as plain
+    # Python objects. Arrow would merge dicts into one struct of every key and unify list
+    # element types, which changes the documents written back on save.
+    order = {}
+    chunks = {}
+    objects = {}
+    rows = 0
+    for raw_batch in raw_batches:
+        docs = bson.decode_all(raw_batch, collection.codec_options)
+        columns = batch_to_columns(docs)
+        order.update(dict.fromkeys(columns))
+        for name in order:
+            values = columns.get(name) or [None] * len(docs)
+            if name in objects:
+                objects[name].extend(values)
+                continue
+            if name not in chunks:
+                chunks[name] = [pa.nulls(rows)]
+            try:
+                array = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                array = None
+            if array is None or pa.types.is_nested(array.type):
+                objects[name] = [v for chunk in chunks.pop(name) for v in chunk.to_pylist()] + values
+            else:
+                chunks[name].append(array)
+        rows += len(docs)
+
+    arrays = {}
+    for name, column_chunks in chunks.items():
+        try:
+            arrays[name] = pa.concat_tables(
+                [pa.table({name: chunk}) for chunk in column_chunks],
+                promote_options='permissive',
+            ).column(name)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            objects[name] = [v for chunk in column_chunks for v in chunk.to_pylist()]
+
+    table = pa.table({name: arrays[name] for name in order if name in arrays})
+    data = table.to_pandas(types_mapper=pd.ArrowDtype, self_destruct=True)
+    for position, name in enumerate(order):
+        if name in objects:
+            data.insert(position, name, pd.Series(objects[name], dtype=object))
     return data
 
-# Save data to the selected collection
-def save_data(client, db_name, collection_name, data):
+# Lazily build one document per row, mapping pandas missing values to None
+def iter_records(data):
+    columns = list(data.columns)
+    for row in data.itertuples(index=False, name=None):
+        yield {col: None if value is pd.NA or value is pd.NaT else value for col, value in zip(columns, row)}
+
+# Run `write` over every batch, keeping at most SAVE_WORKERS batches in flight so memory stays bounded
+def write_batches(write, batches):
+    with ThreadPoolExecutor(max_workers=SAVE_WORKERS) as pool:
+        pending = set()
+        for batch in batches:
+            if len(pending) >= SAVE_WORKERS:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(pool.submit(write, batch))
+        for future in pending:
+            future.result()
+
+# Whether an index on the collection starts with `key_column`, so upserts can look documents up by it
+@st.cache_data(ttl=60, show_spinner=False)
+def has_key_index(_client, db_name, collection_name, key_column):
+    indexes = _client[db_name][collection_name].index_information()
+    return any(index['key'][0][0] == key_column for index in indexes.values())
+
+# Save data to the selected collection, upserting on `key_column` or replacing the collection
+def save_data(client, db_name, collection_name, data, key_column=None):
     db = client[db_name]
-    collection = db[collection_name]
-    collection.delete_many({})
-    collection.insert_many(data.to_dict('records'))
+    if key_column:
+        # A missing key would match every document lacking the field, and with unordered batches
+        # it is undefined which of several rows with the same key wins; refuse both before writing
+        keys = data[key_column]
+        if keys.isna().any():
+            raise ValueError(f"Column '{key_column}' has missing values and can't be used as the primary key")
+        if keys.duplicated().any():
+            raise ValueError(f"Column '{key_column}' has duplicate values and can't be used as the primary key")
+    records = iter_records(data)
+    if key_column:
+        collection = db[collection_name]
+        ops = (UpdateOne({key_column: record[key_column]}, {'$set': record}, upsert=True) for record in records)
+        # Batches run one at a time: concurrent upserts of the same key on a non-unique index
+        # can both insert. Validation stays on since this writes into the live collection.
+        for batch in iter_batches(ops, SAVE_BATCH_SIZE):
+            collection.bulk_write(batch, ordered=False)
+    else:
+        db.drop_collection(collection_name)
+        collection = db[collection_name]
+        write = partial(collection.insert_many, ordered=False, bypass_document_validation=True)
+        write_batches(write, iter_batches(records, SAVE_BATCH_SIZE))
 
-# Add new column
+# Add new column, Arrow-typed so the frame can still be stored as Parquet
 def add_column(data, column_name, default_value):
-    data[column_name] = default_value
+    data[column_name] = pd.Series(default_value, index=data.index, dtype=pd.ArrowDtype(pa.string()))
     return data
 
+# Arrow string array of a column, converting other dtypes with pandas' string conversion
+def to_arrow_strings(series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.ArrowDtype) and (pa.types.is_string(dtype.pyarrow_dtype) or pa.types.is_large_string(dtype.pyarrow_dtype)):
+        return pa.array(series)
+    return pa.array(series.astype('string'), type=pa.string())
+
 # Merge columns
 def merge_columns(data, col1, col2, new_col_name, drop_originals):
-    data[new_col_name] = data[col1].astype(str) + data[col2].astype(str)
+    # Joined in Arrow, so the merged column stays Arrow-typed whatever the source dtypes
+    left, right = to_arrow_strings(data[col1]), to_arrow_strings(data[col2])
+    merged = pc.binary_join_element_wise(
+        left, right.cast(left.type), pa.scalar('', type=left.type),
+        null_handling='replace', null_replacement='',
+    )
+    data[new_col_name] = pd.Series(merged, index=data.index, dtype=pd.ArrowDtype(left.type))
     if drop_originals:
-        data = data.drop(columns=[col1, col2])
+        data.drop(columns=[col1, col2], inplace=True)
     return data
 
 # Remove column
 def remove_columns(data, columns):
-    return data.drop(columns=columns)
+    data.drop(columns=columns, inplace=True)
+    return data
+
+# Compiled kernel: overwrite every non-missing element equal to `condition` with `new_value`
+@njit(cache=True, parallel=True)
+def replace_equal(values, missing, condition, new_value):
+    for i in prange(values.size):
+        if not missing[i] and values[i] == condition:
+            values[i] = new_value
+
+# Numeric fast path for conditional updates; returns None when it doesn't apply
+def numeric_conditional_update(values, condition, new_value):
+    if not is_numeric_dtype(values.dtype) or is_bool_dtype(values.dtype):
+        return None
+    # Arrow and nullable columns report the numpy dtype of their values; plain numpy dtypes are their own
+    dtype = np.dtype(getattr(values.dtype, 'numpy_dtype', values.dtype))
+    if dtype.kind not in 'iuf':
+        return None
+    # Integer columns parse with int(): float() would round values above 2**53
+    integer = dtype.kind in 'iu'
+    try:
+        if integer:
+            condition, new_value = int(condition), int(new_value)
+        else:
+            condition, new_value = float(condition), float(new_value)
+    except ValueError:
+        return None
+    if integer:
+        bounds = np.iinfo(dtype)
+        if not (bounds.min <= condition <= bounds.max and bounds.min <= new_value <= bounds.max):
+            return None
+    # Missing values (fields absent from some documents) are filled for the kernel, skipped by it
+    # and restored afterwards, so the column keeps its dtype whether or not it has gaps
+    missing = values.isna().to_numpy()
+    # np.array copies: to_numpy can return a read-only Arrow buffer or a view of the column itself
+    array = np.array(values.to_numpy(dtype=dtype, na_value=0))
+    # Both values take the column's own type, so e.g. '0.1' matches a float32 0.1
+    replace_equal(array, missing, dtype.type(condition), dtype.type(new_value))
+    updated = pd.Series(array, index=values.index, name=values.name).astype(values.dtype)
+    return updated.mask(missing) if missing.any() else updated
 
 # Conditional update
 def conditional_update(data, column, condition, new_value):
-    data.loc[data[column] == condition, column] = new_value
+    updated = numeric_conditional_update(data[column], condition, new_value)
+    if updated is not None:
+        data[column] = updated
+        return data
+    # Compare as strings: the condition comes from a text input, whatever the column dtype
+    values = data[column]
+    matches = values.astype(str) == str(condition)
+    try:
+        data[column] = values.mask(matches, new_value)
+    except (TypeError, ValueError):
+        # Typed (e.g. Arrow) columns reject values of another type; widen to object like .loc did
+        data[column] = values.astype(object).mask(matches, new_value)
     return data
 
 # Rename column
 def rename_column(data, old_column_name, new_column_name):
-    data = data.rename(columns={old_column_name: new_column_name})
+    # Only the column Index is rebuilt; the column blocks are left untouched
+    data.columns = data.columns.where(data.columns != old_column_name, new_column_name)
+    return data
+
+# Read with a fast engine, falling back to the reader's defaults if that engine fails
+def read_with_fallback(reader, uploaded_file, **engine_kwargs):
+    try:
+        return reader(uploaded_file, **engine_kwargs)
+    except Exception:
+        uploaded_file.seek(0)
+        return reader(uploaded_file)
+
+# BSON has no date-only or time-only type: store dates as datetimes and times as text
+def to_bson_types(data):
+    for col in data.columns:
+        dtype = data[col].dtype
+        if isinstance(dtype, pd.ArrowDtype):
+            if pa.types.is_date(dtype.pyarrow_dtype):
+                data[col] = data[col].astype(pd.ArrowDtype(pa.timestamp('ms')))
+            elif pa.types.is_time(dtype.pyarrow_dtype):
+                data[col] = data[col].astype(pd.ArrowDtype(pa.string()))
     return data
 
 # Process uploaded file
@@ -67,36 +293,133 @@ def process_uploaded_file(uploaded_file):
     if uploaded_file is not None:
         try:
             if uploaded_file.name.endswith('.csv'):
-                data = pd.read_csv(uploaded_file)
+                data = read_with_fallback(pd.read_csv, uploaded_file, engine='pyarrow', dtype_backend='pyarrow')
             elif uploaded_file.name.endswith('.xlsx'):
-                data = pd.read_excel(uploaded_file)
+                data = read_with_fallback(pd.read_excel, uploaded_file, engine='calamine', dtype_backend='pyarrow')
             else:
                 st.error("Unsupported file type. Please upload a CSV or Excel file.")
                 return None
-            return data
+            return to_bson_types(data)
         except Exception as e:
             st.error(f"Error processing file: {e}")
             return None
     return None
 
+# Types serialize_complex_data passes through untouched
+PLAIN_TYPES = frozenset({str, int, float, bool, type(None)})
+
 # Function to serialize complex data types to JSON strings
 def serialize_complex_data(value):
-    if isinstance(value, (list, dict)):
-        return json.dumps(value, default=str)
+    # Exact-type lookup first: plain scalars are most cells and skip the isinstance checks
+    if type(value) in PLAIN_TYPES:
+        return value
+    elif isinstance(value, (list, dict)):
+        try:
+            return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # orjson rejects integers wider than 64 bits; the stdlib encoder handles them
+            return json.dumps(value, default=str)
     elif isinstance(value, datetime):
         return value.isoformat()
     else:
         return value
 
-# Apply serialization to the DataFrame
+# Apply serialization to the DataFrame, touching only object columns; typed columns,
+# datetimes included, are read natively by DuckDB
 def serialize_dataframe(data):
-    return data.applymap(serialize_complex_data)
+    data = data.copy(deep=False)
+    for col in data.columns:
+        series = data[col]
+        if series.dtype == object:
+            data[col] = series.map(serialize_complex_data)
+    return data
+
+# Compress a DataFrame to Parquet bytes. Only frames made entirely of scalar Arrow columns
+# with string names round-trip unchanged; anything else (numpy dtypes, object columns,
+# embedded documents) is kept as-is rather than retyped. Every stored change, a cell edit
+# included, re-encodes the whole frame: a zstd pass per change buys a session copy several
+# times smaller than the frame, which is what large collections need
+def store_frame(data):
+    if not all(isinstance(name, str) for name in data.columns) or not all(
+        isinstance(dtype, pd.ArrowDtype) and not pa.types.is_nested(dtype.pyarrow_dtype) for dtype in data.dtypes
+    ):
+        return data
+    buffer = io.BytesIO()
+    try:
+        pq.write_table(pa.Table.from_pandas(data), buffer, compression='zstd')
+    except (ValueError, TypeError, pa.ArrowNotImplementedError):
+        return data
+    return buffer.getvalue()
+
+# Rebuild a DataFrame stored by store_frame
+def load_frame(stored):
+    if isinstance(stored, bytes):
+        return pq.read_table(io.BytesIO(stored)).to_pandas(types_mapper=pd.ArrowDtype)
+    return stored
+
+# Store the working DataFrame, replacing views derived from the previous one
+def set_data(data, serialized_data=None):
+    st.session_state.data = store_frame(data)
+    st.session_state.data_columns = tuple(data.columns)
+    st.session_state.pending_ops = []
+    if serialized_data is None:
+        st.session_state.pop('serialized_data', None)
+    else:
+        st.session_state.serialized_data = serialized_data
+
+# Defer a DataFrame transformation until the data is next rendered
+def queue_op(op):
+    st.session_state.setdefault('pending_ops', []).append(op)
 
-# Execute SQL query on DataFrame
-def execute_sql_query(data, query):
-    # Serialize complex data types
-    serialized_data = serialize_dataframe(data)
-    return psql.sqldf(query, {'data': serialized_data})
+# Apply the transformations queued this run. The queue is taken first and the ops run on a
+# shallow copy, so a failing op is reported once and leaves the stored data untouched
+def apply_pending_ops(data):
+    ops = st.session_state.pop('pending_ops', None)
+    if ops:
+        try:
+            updated = reduce(lambda df, op: op(df), ops, data.copy(deep=False))
+        except Exception as e:
+            st.error(f"Error applying changes: {e}")
+            return data
+        set_data(updated)
+        return updated
+    return data
+
+# Serialized view of the working DataFrame, rebuilt only after the data changes
+def get_serialized_data(data):
+    if 'serialized_data' not in st.session_state:
+        st.session_state.serialized_data = serialize_dataframe(data)
+    return st.session_state.serialized_data
+
+# Execute SQL query on an already serialized DataFrame
+def execute_sql_query(serialized_data, query):
+    con = duckdb.connect()
+    try:
+        con.register('data', serialized_data)
+        return con.execute(query).fetch_df()
+    finally:
+        con.close()
+
+# Show one page of rows in the data editor and write any edits back into the full DataFrame
+def edit_page(data):
+    page_count = max(1, math.ceil(len(data) / EDITOR_PAGE_SIZE))
+    # A stable key keeps the current page when the row count changes; clamp it if the data shrank
+    if st.session_state.get('editor_page', 1) > page_count:
+        st.session_state.editor_page = page_count
+    page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key='editor_page')
+    st.caption(f"Page {page} of {page_count}")
+    start = (page - 1) * EDITOR_PAGE_SIZE
+    window = data.iloc[start:start + EDITOR_PAGE_SIZE]
+    edited_window = st.data_editor(window, height=600)
+    changed = False
+    for col in window.columns:
+        # The editor hands back values it can't display (e.g. ObjectId) as text, so compare as text
+        edited_cells = edited_window[col].astype(str) != window[col].astype(str)
+        if edited_cells.any():
+            data.loc[edited_window.index[edited_cells], col] = edited_window[col][edited_cells]
+            changed = True
+    if changed:
+        set_data(data)
 
 def main():
     st.set_page_config(layout="wide")
@@ -115,12 +438,19 @@ def main():
     else:
         db_name = st.text_input("New Database Name", key='new_db_name')
 
+    fields = None
     if db_name:
         # Option to use an existing collection or create a new one
         collection_choice = st.radio("Collection Option", ["Use Existing", "Create New"], key='collection_option')
         if collection_choice == "Use Existing":
             collection_names = get_collection_names(client, db_name)
             collection_name = st.selectbox("Collection", collection_names, key='collection_select')
+            if collection_name:
+                # Fields are only projected when some are deselected, so fields missing from the sample still load
+                field_names = get_field_names(client, db_name, collection_name)
+                selected_fields = st.multiselect("Fields to load", field_names, default=field_names, key=f'load_fields_{db_name}_{collection_name}')
+                if set(selected_fields) != set(field_names):
+                    fields = selected_fields
         else:
             collection_name = st.text_input("New Collection Name", key='new_collection_name')
 
@@ -133,9 +463,13 @@ def main():
 
     with col1:
         if st.button("Load Data"):
-            if db_name and collection_name:
-                data = load_data(client, db_name, collection_name)
-                st.session_state.data = data
+            if fields == []:
+                st.error("Please select at least one field to load.")
+            elif db_name and collection_name:
+                data = load_data(client, db_name, collection_name, fields)
+                set_data(data)
+                # Remembered so a save can't replace the collection with only the loaded fields
+                st.session_state.partial_load = bool(fields)
                 st.success("Data loaded successfully!")
             else:
                 st.error("Please select a database and collection.")
@@ -146,14 +480,19 @@ def main():
                 data = process_uploaded_file(uploaded_file)
                 if data is not None:
                     save_data(client, db_name, collection_name, data)
-                    st.session_state.data = data
+                    clear_name_caches()
+                    set_data(data)
+                    st.session_state.partial_load = False
                     st.success(f"File '{uploaded_file.name}' uploaded and saved to {db_name}.{collection_name}!")
             else:
                 st.error("Please upload a file and select a database and collection.")
 
     # Display and manipulate loaded or uploaded data
     if 'data' in st.session_state:
-        data = st.session_state.data
+        # Decoded once per run; later steps reuse this frame
+        data = apply_pending_ops(load_frame(st.session_state.data))
+        columns = st.session_state.data_columns
+        columns_changed = False
         st.header(f"Data from {db_name}.{collection_name}")
 
         # Sidebar - Data Manipulation
@@ -165,64 +504,60 @@ def main():
             default_val = st.text_input("Default value for new column", key='add_default_val')
             if st.button("Add Column", key='add_column_button'):
                 if new_col:
-                    data = add_column(data, new_col, default_val)
-                    st.session_state.data = data
+                    queue_op(partial(add_column, column_name=new_col, default_value=default_val))
                     st.success(f"Column '{new_col}' added with default value '{default_val}'")
-                    st.experimental_rerun()
+                    columns_changed = True
                 else:
                     st.error("Column name cannot be empty")
         
         # Merge columns
         with st.sidebar.expander("Merge Columns"):
-            col1 = st.selectbox("Select first column to merge", data.columns, key='merge_col1')
-            col2 = st.selectbox("Select second column to merge", data.columns, key='merge_col2')
+            col1 = st.selectbox("Select first column to merge", columns, key='merge_col1')
+            col2 = st.selectbox("Select second column to merge", columns, key='merge_col2')
             merged_col_name = st.text_input("New column name for merged columns", key='merged_col_name')
             drop_originals = st.checkbox("Drop original columns after merging", key='drop_originals')
             if st.button("Merge Columns", key='merge_columns_button'):
                 if col1 and col2 and merged_col_name:
-                    data = merge_columns(data, col1, col2, merged_col_name, drop_originals)
-                    st.session_state.data = data
+                    queue_op(partial(merge_columns, col1=col1, col2=col2, new_col_name=merged_col_name, drop_originals=drop_originals))
                     st.success(f"Columns '{col1}' and '{col2}' merged into '{merged_col_name}'")
-                    st.experimental_rerun()
+                    columns_changed = True
                 else:
                     st.error("Please provide all details for merging columns")
 
         # Remove columns
         with st.sidebar.expander("Remove Columns"):
-            cols_to_remove = st.multiselect("Select columns to remove", data.columns, key='remove_columns')
+            cols_to_remove = st.multiselect("Select columns to remove", columns, key='remove_columns')
             if st.button("Remove Columns", key='remove_columns_button'):
                 if cols_to_remove:
-                    data = remove_columns(data, cols_to_remove)
-                    st.session_state.data = data
+                    queue_op(partial(remove_columns, columns=cols_to_remove))
                     st.success(f"Columns {', '.join(cols_to_remove)} removed")
-                    st.experimental_rerun()
+                    columns_changed = True
                 else:
                     st.error("Please select columns to remove")
         
         # Rename column
         with st.sidebar.expander("Rename Column"):
-            old_col_name = st.selectbox("Select column to rename", data.columns, key='rename_col_old')
+            old_col_name = st.selectbox("Select column to rename", columns, key='rename_col_old')
             new_col_name = st.text_input("New column name", key='rename_col_new')
             if st.button("Rename Column", key='rename_column_button'):
-                if old_col_name and new_col_name:
-                    data = rename_column(data, old_col_name, new_col_name)
-                    st.session_state.data = data
+                if new_col_name in columns:
+                    st.error(f"Column '{new_col_name}' already exists")
+                elif old_col_name and new_col_name:
+                    queue_op(partial(rename_column, old_column_name=old_col_name, new_column_name=new_col_name))
                     st.success(f"Column '{old_col_name}' renamed to '{new_col_name}'")
-                    st.experimental_rerun()
+                    columns_changed = True
                 else:
                     st.error("Please provide both the old and new column names")
 
         # Conditional updates
         with st.sidebar.expander("Conditional Update"):
-            col_to_update = st.selectbox("Select column to update", data.columns, key='update_col')
+            col_to_update = st.selectbox("Select column to update", columns, key='update_col')
             condition_val = st.text_input("Condition value", key='condition_value')
             new_val = st.text_input("New value", key='new_value')
             if st.button("Update Column", key='update_button'):
                 if col_to_update and condition_val and new_val:
-                    data = conditional_update(data, col_to_update, condition_val, new_val)
-                    st.session_state.data = data
+                    queue_op(partial(conditional_update, column=col_to_update, condition=condition_val, new_value=new_val))
                     st.success(f"Column '{col_to_update}' updated where value was '{condition_val}'")
-                    st.experimental_rerun()
                 else:
                     st.error("Please provide all details for the update")
 
@@ -232,21 +567,49 @@ def main():
             if st.button("Execute SQL", key='execute_sql_button'):
                 if query:
                     try:
-                        query_result = execute_sql_query(data, query)
-                        st.session_state.data = query_result
+                        query_result = execute_sql_query(get_serialized_data(data), query)
+                        # DuckDB reads its own output back as-is, so the result is its own serialized view
+                        set_data(query_result, serialized_data=query_result)
+                        data = query_result
                         st.success("SQL query executed successfully")
-                        st.experimental_rerun()
+                        columns_changed = True
                     except Exception as e:
                         st.error(f"Error executing SQL query: {e}")
                 else:
                     st.error("Please enter a SQL query")
 
-        edited_data = st.data_editor(data, height=600)
+        data = apply_pending_ops(data)
+        # Only rerun when an edit changed the columns the sidebar widgets were built from;
+        # value updates are already reflected in the editor below
+        if columns_changed and st.session_state.data_columns != columns:
+            st.rerun()
+        columns = st.session_state.data_columns
+        edit_page(data)
 
         # Sidebar - Save Data button
+        key_column = st.sidebar.selectbox(
+            "Primary key column",
+            (None,) + columns,
+            format_func=lambda col: "None (replace collection)" if col is None else col,
+            key='save_key_column',
+        )
+        if key_column and not has_key_index(client, db_name, collection_name, key_column):
+            st.sidebar.warning(f"No index on '{key_column}': every upsert will scan the collection. Consider creating one.")
+        # Only some fields were loaded: replacing the collection would drop every other field
+        partial_load = st.session_state.get('partial_load', False)
+        if partial_load:
+            st.sidebar.info("Only some fields were loaded, so saving needs a primary key column: matching documents are updated and keep their other fields.")
         if st.sidebar.button("Save Data", key='save_data_button'):
-            save_data(client, db_name, collection_name, edited_data)
-            st.sidebar.success("Data saved successfully!")
+            if partial_load and not key_column:
+                st.sidebar.error("Please choose a primary key column to save data loaded with only some fields")
+            else:
+                try:
+                    save_data(client, db_name, collection_name, data, key_column)
+                except ValueError as e:
+                    st.sidebar.error(str(e))
+                else:
+                    clear_name_caches()
+                    st.sidebar.success("Data saved successfully!")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
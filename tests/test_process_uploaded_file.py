@@ -0,0 +1,18 @@
+import io
+from datetime import datetime
+
+import bson
+
+from gui_main import iter_records, process_uploaded_file
+
+# Date and time columns in an uploaded CSV must come out as values BSON can encode
+def test_csv_date_and_time_columns_encode_as_bson():
+    uploaded_file = io.BytesIO(b"day,time,n\n2020-01-01,12:30:00,1\n2020-02-01,13:00:00,2\n")
+    uploaded_file.name = 'dates.csv'
+    data = process_uploaded_file(uploaded_file)
+    records = list(iter_records(data))
+    for record in records:
+        bson.encode(record)
+    assert records[0]['day'] == datetime(2020, 1, 1)
+    assert records[0]['time'] == '12:30:00'
+    assert records[1]['n'] == 2